@@ -5,11 +5,23 @@ Image size: 1024x250px
 Follows iOS design guidelines with SF Pro font and system colors.
 """
 
+import io
 import json
+import math
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+from itertools import groupby
 from PIL import Image, ImageDraw, ImageFont
 
+try:
+    # Optional C JSON parser for faster CLI/batch input parsing
+    import orjson
+except ImportError:
+    orjson = None
+
 # iOS System Colors (Light Mode)
 COLOR_AVAILABLE = (52, 199, 89)  # iOS System Green
 COLOR_UNAVAILABLE = (255, 107, 0)  # Hot Orange for unavailable
@@ -22,6 +34,12 @@ COLOR_TIMELINE = (142, 142, 147)  # Gray timeline color
 COLOR_TIMELINE_TICK = (174, 174, 178)  # Lighter gray for tick marks
 COLOR_CURRENT_TIME = (128, 128, 128)  # iOS System Blue for current time marker
 
+# Line colors per hour state; any other state is drawn in COLOR_TIMELINE
+STATE_COLORS = {
+    "●": COLOR_AVAILABLE,
+    "✕": COLOR_UNAVAILABLE,
+}
+
 # Image dimensions (default horizontal)
 WIDTH = 1024
 HEIGHT = 250
@@ -29,11 +47,21 @@ MARGIN = 24  # iOS standard margin
 CARD_PADDING = 16  # iOS card padding
 CORNER_RADIUS = 12  # iOS standard corner radius
 
+# PNG zlib level: 1 encodes faster than the default 6 at the cost of slightly larger files
+PNG_COMPRESS_LEVEL = 1
+
+# Number of rendered PNGs kept in memory by render_png (servers replaying the
+# same grid data are answered from this cache); set to 0 to disable caching
+IMAGE_CACHE_SIZE = int(os.getenv("IMAGE_CACHE_SIZE", 128))
+
+# Version of the rendered output; bump whenever a change alters the pixels so
+# clients holding an old image ETag get the new image instead of a 304
+RENDERER_VERSION = 1
 
-def get_hour_state(data, hour):
-    """Get the state for a specific hour (0-23)."""
-    key = f"T_{hour:02d}"
-    return data.get(key, "●")
+
+def get_hour_states(data):
+    """Get the states for all 24 hours (0-23) as a list."""
+    return [data.get(f"T_{hour:02d}", "●") for hour in range(24)]
 
 
 def draw_rounded_rectangle(draw, bbox, radius, fill=None, outline=None, width=1):
@@ -41,54 +69,83 @@ def draw_rounded_rectangle(draw, bbox, radius, fill=None, outline=None, width=1)
     x1, y1, x2, y2 = bbox
     radius = min(radius, (x2 - x1) / 2, (y2 - y1) / 2)  # Ensure radius fits
     
-    if fill:
-        # Draw main rectangle body
-        draw.rectangle([x1 + radius, y1, x2 - radius, y2], fill=fill)
-        draw.rectangle([x1, y1 + radius, x2, y2 - radius], fill=fill)
-        
-        # Draw rounded corner circles
-        draw.ellipse([x1, y1, x1 + 2*radius, y1 + 2*radius], fill=fill)
-        draw.ellipse([x2 - 2*radius, y1, x2, y1 + 2*radius], fill=fill)
-        draw.ellipse([x1, y2 - 2*radius, x1 + 2*radius, y2], fill=fill)
-        draw.ellipse([x2 - 2*radius, y2 - 2*radius, x2, y2], fill=fill)
-    
-    if outline:
-        # Draw outline using lines and arcs
-        # Top edge
-        draw.line([(x1 + radius, y1), (x2 - radius, y1)], fill=outline, width=width)
-        # Bottom edge
-        draw.line([(x1 + radius, y2), (x2 - radius, y2)], fill=outline, width=width)
-        # Left edge
-        draw.line([(x1, y1 + radius), (x1, y2 - radius)], fill=outline, width=width)
-        # Right edge
-        draw.line([(x2, y1 + radius), (x2, y2 - radius)], fill=outline, width=width)
-        # Rounded corners (arcs)
-        draw.arc([x1, y1, x1 + 2*radius, y1 + 2*radius], 180, 270, fill=outline, width=width)
-        draw.arc([x2 - 2*radius, y1, x2, y1 + 2*radius], 270, 360, fill=outline, width=width)
-        draw.arc([x1, y2 - 2*radius, x1 + 2*radius, y2], 90, 180, fill=outline, width=width)
-        draw.arc([x2 - 2*radius, y2 - 2*radius, x2, y2], 0, 90, fill=outline, width=width)
-
-
-def get_ios_font(size, weight="regular"):
-    """Get iOS SF Pro font or fallback to system font."""
-    font_paths = [
+    # Single native call instead of composing rectangles, ellipses and arcs
+    draw.rounded_rectangle(bbox, radius=radius, fill=fill, outline=outline, width=width)
+
+
+# Fallback font paths tried after the weight-specific SF Pro variants
+FALLBACK_FONT_PATHS = (
+    "/System/Library/Fonts/Supplemental/SF-Pro-Text-Regular.otf",
+    "/System/Library/Fonts/Supplemental/SFProText-Regular.otf",
+    "/System/Library/Fonts/Helvetica.ttc",
+    "/Library/Fonts/Arial.ttf",
+)
+
+# DejaVu Sans from the fonts-dejavu-core package (installed in the Docker images),
+# so Linux hosts render with FreeType at the requested size instead of load_default()
+DEJAVU_FONT_PATHS = {
+    "regular": "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "semibold": "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+}
+
+
+@lru_cache(maxsize=None)
+def find_font_path(weight="regular"):
+    """Get the first existing SF Pro/system font file for a weight, or None (cached)."""
+    font_paths = (
         f"/System/Library/Fonts/Supplemental/SF-Pro-Text-{weight.capitalize()}.otf",
         f"/System/Library/Fonts/Supplemental/SFProText-{weight.capitalize()}.otf",
-        "/System/Library/Fonts/Supplemental/SF-Pro-Text-Regular.otf",
-        "/System/Library/Fonts/Supplemental/SFProText-Regular.otf",
-        "/System/Library/Fonts/Helvetica.ttc",
-        "/Library/Fonts/Arial.ttf",
-    ]
+    ) + FALLBACK_FONT_PATHS + (DEJAVU_FONT_PATHS.get(weight, DEJAVU_FONT_PATHS["regular"]),)
     
-    for path in font_paths:
+    return next((path for path in font_paths if os.path.exists(path)), None)
+
+
+@lru_cache(maxsize=32)
+def get_ios_font(size, weight="regular"):
+    """Get iOS SF Pro font or fallback to system font (cached per size/weight)."""
+    font_path = find_font_path(weight)
+    if font_path is not None:
         try:
-            return ImageFont.truetype(path, size)
-        except:
-            continue
+            return ImageFont.truetype(font_path, size)
+        except OSError:
+            pass
     
     return ImageFont.load_default()
 
 
+@lru_cache(maxsize=8)
+def get_hour_label_sizes(size, weight="regular"):
+    """Get the (advance width, height) of each "HH:00" hour label (0-23) for a font (cached)."""
+    font = get_ios_font(size, weight)
+    sizes = []
+    for hour in range(24):
+        hour_label = f"{hour:02d}:00"
+        text_bbox = font.getbbox(hour_label)
+        sizes.append((font.getlength(hour_label), text_bbox[3] - text_bbox[1]))
+    return tuple(sizes)
+
+
+def get_dash_offsets(total_length, dash_length, gap_length):
+    """Get the (start, end) offsets of every dash along a line of the given length."""
+    step = dash_length + gap_length
+    dash_starts = [i * step for i in range(math.ceil(total_length / step))]
+    return [(start, min(start + dash_length, total_length)) for start in dash_starts]
+
+
+@lru_cache(maxsize=16)
+def get_dashed_line_mask(total_length, vertical, dash_length, gap_length):
+    """Pre-rasterize a 1px dashed line of whole-pixel length from (0, 0) into an 'L' mask (cached)."""
+    size = (1, total_length + 1) if vertical else (total_length + 1, 1)
+    mask = Image.new('L', size, 0)
+    mask_draw = ImageDraw.Draw(mask)
+    for start_pos, end_pos in get_dash_offsets(total_length, dash_length, gap_length):
+        if vertical:
+            mask_draw.line([(0, start_pos), (0, end_pos)], fill=255, width=1)
+        else:
+            mask_draw.line([(start_pos, 0), (end_pos, 0)], fill=255, width=1)
+    return mask
+
+
 def draw_dashed_line(draw, points, fill, width=1, dash_length=5, gap_length=3):
     """Draw a dashed line between two points.
     
@@ -114,63 +171,68 @@ def draw_dashed_line(draw, points, fill, width=1, dash_length=5, gap_length=3):
     if total_length == 0:
         return
     
+    # Axis-aligned 1px dashes with whole-pixel lengths: blit the cached
+    # pre-rasterized dash pattern (same pixels as drawing each dash)
+    if (width == 1 and min(x1, y1, dx, dy) >= 0 and (dx == 0 or dy == 0)
+            and total_length.is_integer()
+            and isinstance(dash_length, int) and isinstance(gap_length, int)):
+        mask = get_dashed_line_mask(int(total_length), dx == 0, dash_length, gap_length)
+        draw.bitmap((int(x1), int(y1)), mask, fill=fill)
+        return
+    
     # Normalize direction vector
     unit_x = dx / total_length
     unit_y = dy / total_length
     
-    # Draw dashes
-    current_pos = 0
-    while current_pos < total_length:
-        # Start of dash
-        dash_start_x = x1 + unit_x * current_pos
-        dash_start_y = y1 + unit_y * current_pos
-        
-        # End of dash (either dash_length or remaining distance)
-        dash_end_pos = min(current_pos + dash_length, total_length)
-        dash_end_x = x1 + unit_x * dash_end_pos
-        dash_end_y = y1 + unit_y * dash_end_pos
-        
-        # Draw the dash segment
-        draw.line([(dash_start_x, dash_start_y), (dash_end_x, dash_end_y)],
+    for start_pos, end_pos in get_dash_offsets(total_length, dash_length, gap_length):
+        draw.line([(x1 + unit_x * start_pos, y1 + unit_y * start_pos),
+                   (x1 + unit_x * end_pos, y1 + unit_y * end_pos)],
                  fill=fill, width=width)
-        
-        # Move to next dash position
-        current_pos += dash_length + gap_length
 
 
-def get_previous_state(data, hour):
-    """Get the state of the previous hour, or current if hour is 0."""
-    if hour == 0:
-        return get_hour_state(data, 0)
-    return get_hour_state(data, hour - 1)
+def get_state_color(state):
+    """Get the color for a given state."""
+    return STATE_COLORS.get(state, COLOR_TIMELINE)  # Default gray
 
 
-def get_next_state(data, hour):
-    """Get the state of the next hour, or current if hour is 23."""
-    if hour == 23:
-        return get_hour_state(data, 23)
-    return get_hour_state(data, hour + 1)
+def build_line_segments(states, timeline_start, hour_size):
+    """Build (start, end, color) segments of the availability line along the timeline axis.
+    
+    A partial hour ('%') is split in the middle: the first half takes the color
+    of the previous hour and the second half the color of the next hour.
+    """
+    colors = [get_state_color(state) for state in states]
+    line_segments = []
+    
+    for hour, state in enumerate(states):
+        hour_start = timeline_start + hour * hour_size
+        hour_end = timeline_start + (hour + 1) * hour_size
+        
+        if state == "%":
+            # Partial: previous state to middle, next state from middle
+            hour_mid = hour_start + hour_size / 2
+            line_segments.append((hour_start, hour_mid, colors[hour - 1 if hour > 0 else 0]))
+            line_segments.append((hour_mid, hour_end, colors[hour + 1 if hour < 23 else 23]))
+        else:
+            # Full hour: single state
+            line_segments.append((hour_start, hour_end, colors[hour]))
+    
+    return line_segments
 
 
-def get_state_color(state):
-    """Get the color for a given state."""
-    if state == "●":
-        return COLOR_AVAILABLE
-    elif state == "✕":
-        return COLOR_UNAVAILABLE
-    else:
-        return COLOR_TIMELINE  # Default gray
+def merge_segment_runs(segments):
+    """Merge consecutive (start, end, color) segments of the same color into runs."""
+    runs = []
+    for color, group in groupby(segments, key=lambda segment: segment[2]):
+        group = list(group)
+        runs.append((group[0][0], group[-1][1], color))
+    return runs
 
 
 def is_today(tdate_str):
     """Check if TDate matches today's date. TDate format: DD-MM-YYYY"""
-    try:
-        # Parse TDate (format: DD-MM-YYYY)
-        tdate = datetime.strptime(tdate_str, "%d-%m-%Y")
-        today = datetime.now().date()
-        return tdate.date() == today
-    except:
-        return False
+    # Compare against today's date in the same zero-padded format instead of parsing
+    return tdate_str == datetime.now().strftime("%d-%m-%Y")
 
 
 def get_current_time_position():
@@ -179,10 +241,42 @@ def get_current_time_position():
     return now.hour + now.minute / 60.0
 
 
-def draw_timeline(draw, data, tdate, timeline_y, width, height, vertical=False, timeline_card_height=None):
-    """Draw a continuous line graph showing electricity availability."""
+def get_marker_position(tdate_str):
+    """Get the current time position for the "now" marker if TDate is today, else None."""
+    if is_today(tdate_str):
+        return get_current_time_position()
+    return None
+
+
+@lru_cache(maxsize=8)
+def get_hour_marks_mask(hour_size, mark_length, vertical=False, first_hour=1):
+    """Pre-rasterize 1px hour marks of a timeline into an 'L' mask (cached).
+    
+    Marks run across the timeline axis, one per hour from first_hour to 23:
+    first_hour=0 gives the hour ticks, first_hour=1 the hour-boundary
+    separators. The mask origin is the timeline start along the axis and
+    the mark start across it.
+    """
+    along = math.ceil(24 * hour_size) + 1
+    across = math.ceil(mark_length) + 1
+    mask = Image.new('L', (across, along) if vertical else (along, across), 0)
+    mask_draw = ImageDraw.Draw(mask)
+    for hour in range(first_hour, 24):
+        pos = hour * hour_size
+        if vertical:
+            mask_draw.line([(0, pos), (mark_length, pos)], fill=255, width=1)
+        else:
+            mask_draw.line([(pos, 0), (pos, mark_length)], fill=255, width=1)
+    return mask
+
+
+def get_timeline_geometry(timeline_y, width, height, vertical=False, timeline_card_height=None):
+    """Get the timeline geometry as (timeline_start, timeline_length, line_position).
+    
+    For vertical timelines the start/length run along the y axis and the line
+    position is an x coordinate; for horizontal timelines it is the other way round.
+    """
     if vertical:
-        # Vertical orientation: timeline goes from top to bottom
         # Use timeline_card_height if provided, otherwise calculate from height
         if timeline_card_height is not None:
             timeline_height = timeline_card_height - 40  # Account for padding inside card
@@ -190,264 +284,173 @@ def draw_timeline(draw, data, tdate, timeline_y, width, height, vertical=False,
             timeline_height = height - 2 * MARGIN - 2 * CARD_PADDING - 120  # Reserve space for date/legend
         timeline_x = MARGIN + CARD_PADDING + 70  # Leave space for hour labels on left (increased for "05:00")
         timeline_y_start = timeline_y + 20  # Reduced spacing since no title
-        hour_height = timeline_height / 24
         line_x = timeline_x + 20  # X position for the availability line
-        line_width = 6  # Thickness of the line
-        timeline_axis_x = line_x  # Position of the gray timeline axis
-        
-        # Draw gray timeline axis (vertical line)
-        draw.line([(timeline_axis_x, timeline_y_start), 
-                   (timeline_axis_x, timeline_y_start + timeline_height)],
-                  fill=COLOR_TIMELINE, width=2)
-        
-        # Draw hour markers (tick marks and labels)
-        font_small = get_ios_font(10, "regular")
-        tick_length = 8
-        
-        for hour in range(24):
-            y_pos = timeline_y_start + hour * hour_height
-            
-            # Draw tick mark
-            draw.line([(timeline_axis_x - tick_length / 2, y_pos),
-                       (timeline_axis_x + tick_length / 2, y_pos)],
-                      fill=COLOR_TIMELINE_TICK, width=1)
-            
-            # Draw hour label (to the left of the timeline)
-            hour_label = f"{hour:02d}:00"
-            text_bbox = draw.textbbox((0, 0), hour_label, font=font_small)
-            text_height = text_bbox[3] - text_bbox[1]
-            text_y = y_pos - text_height / 2
-            draw.text((timeline_axis_x - tick_length / 2 - 35, text_y), hour_label,
-                     fill=COLOR_SECONDARY_TEXT, font=font_small)
-        
-        # Build line segments
-        line_segments = []
-        
-        for hour in range(24):
-            state = get_hour_state(data, hour)
-            hour_start_y = timeline_y_start + hour * hour_height
-            hour_end_y = timeline_y_start + (hour + 1) * hour_height
-            hour_mid_y = timeline_y_start + hour * hour_height + hour_height / 2
-            
-            if state == "%":
-                # Partial: previous state to middle, next state from middle
-                prev_state = get_previous_state(data, hour)
-                next_state = get_next_state(data, hour)
-                
-                # First half: previous state
-                prev_color = get_state_color(prev_state)
-                line_segments.append({
-                    'start_y': hour_start_y,
-                    'end_y': hour_mid_y,
-                    'color': prev_color
-                })
-                
-                # Second half: next state
-                next_color = get_state_color(next_state)
-                line_segments.append({
-                    'start_y': hour_mid_y,
-                    'end_y': hour_end_y,
-                    'color': next_color
-                })
-            else:
-                # Full hour: single state
-                color = get_state_color(state)
-                line_segments.append({
-                    'start_y': hour_start_y,
-                    'end_y': hour_end_y,
-                    'color': color
-                })
-        
-        # Draw continuous line segments (vertical)
-        for segment in line_segments:
-            # Draw thick line segment (vertical)
-            draw.line([(line_x, segment['start_y']),
-                       (line_x, segment['end_y'])],
-                      fill=segment['color'], width=line_width)
+        return timeline_y_start, timeline_height, line_x
+    
+    timeline_width = width - 2 * MARGIN - 2 * CARD_PADDING
+    timeline_x = MARGIN + CARD_PADDING
+    line_y = timeline_y + 40  # Y position for the availability line
+    return timeline_x, timeline_width, line_y
+
+
+def axis_point(along, cross, vertical=False):
+    """Map timeline coordinates (along the time axis, across it) to an (x, y) image point."""
+    return (cross, along) if vertical else (along, cross)
+
+
+def draw_timeline_axis(draw, timeline_y, width, height, vertical=False, timeline_card_height=None):
+    """Draw the static part of the timeline: gray axis, hour ticks and hour labels."""
+    font_small = get_ios_font(10, "regular")
+    hour_label_sizes = get_hour_label_sizes(10, "regular")
+    tick_length = 8
+    
+    # Vertical timelines go from top to bottom, horizontal ones from left to right
+    timeline_start, timeline_length, line_pos = get_timeline_geometry(
+        timeline_y, width, height, vertical=vertical, timeline_card_height=timeline_card_height)
+    hour_size = timeline_length / 24
+    
+    # Draw gray timeline axis (the availability line is drawn on top of it)
+    draw.line([axis_point(timeline_start, line_pos, vertical),
+               axis_point(timeline_start + timeline_length, line_pos, vertical)],
+              fill=COLOR_TIMELINE, width=2)
+    
+    # Draw all 24 tick marks in one call
+    tick_mask = get_hour_marks_mask(hour_size, tick_length, vertical=vertical, first_hour=0)
+    draw.bitmap(axis_point(int(timeline_start), int(line_pos - tick_length / 2), vertical),
+                tick_mask, fill=COLOR_TIMELINE_TICK)
+    
+    # Draw hour labels
+    for hour in range(24):
+        pos = timeline_start + hour * hour_size
+        hour_label = f"{hour:02d}:00"
+        text_width, text_height = hour_label_sizes[hour]
+        
+        if vertical:
+            # To the left of the timeline, centered on the tick
+            text_xy = (line_pos - tick_length / 2 - 35, pos - text_height / 2)
+        else:
+            # Below the timeline, centered on the tick
+            text_xy = (pos - text_width / 2, line_pos + tick_length / 2 + 4)
+        draw.text(text_xy, hour_label, fill=COLOR_SECONDARY_TEXT, font=font_small)
+
+
+def draw_timeline(draw, data, timeline_y, width, height, vertical=False, timeline_card_height=None,
+                  current_time_pos=None):
+    """Draw a continuous line graph showing electricity availability.
+    
+    The axis, ticks and hour labels are part of the cached base image
+    (see draw_timeline_axis), so only data-dependent parts are drawn here.
+    The current time marker is drawn at current_time_pos (0.0 to 24.0) if given.
+    """
+    states = get_hour_states(data)
+    font_small = get_ios_font(10, "regular")
+    line_width = 6  # Thickness of the line
+    
+    timeline_start, timeline_length, line_pos = get_timeline_geometry(
+        timeline_y, width, height, vertical=vertical, timeline_card_height=timeline_card_height)
+    hour_size = timeline_length / 24
+    
+    # Draw continuous line segments, one solid rectangle fill per same-color run
+    # (covers the same pixels as a line of line_width centered on line_pos)
+    cross_start = int(line_pos) - line_width // 2 + 1
+    cross_end = int(line_pos) + line_width // 2
+    line_segments = build_line_segments(states, timeline_start, hour_size)
+    for start, end, color in merge_segment_runs(line_segments):
+        draw.rectangle([axis_point(int(start), cross_start, vertical),
+                        axis_point(int(end), cross_end, vertical)], fill=color)
+    
+    # Draw separators at hour boundaries (subtle), blitted in one call
+    separator_mask = get_hour_marks_mask(hour_size, line_width + 4, vertical=vertical)
+    draw.bitmap(axis_point(int(timeline_start), int(line_pos - line_width / 2 - 2), vertical),
+                separator_mask, fill=COLOR_TIMELINE_TICK)
+    
+    # Draw current time marker (only passed when TDate is today)
+    if current_time_pos is None or not 0 <= current_time_pos < 24:
+        return
+    
+    current = timeline_start + (current_time_pos / 24.0) * timeline_length
+    triangle_size = 3
+    
+    if vertical:
+        current_y = current
+        marker_right = line_pos + line_width / 2 + 9
+        
+        # Draw triangle pointer to the right of the line
+        triangle_points = [
+            (marker_right, current_y - triangle_size),
+            (marker_right, current_y + triangle_size),
+            (marker_right - 2*triangle_size, current_y)
+        ]
+        draw.polygon(triangle_points, fill=COLOR_CURRENT_TIME)
         
-        # Draw horizontal separators at hour boundaries (subtle)
-        for hour in range(1, 24):
-            y_pos = timeline_y_start + hour * hour_height
-            draw.line([(line_x - line_width / 2 - 2, y_pos),
-                       (line_x + line_width / 2 + 2, y_pos)],
-                      fill=COLOR_TIMELINE_TICK, width=1)
+        # Draw "now" label (to the right of the triangle)
+        draw.text((marker_right + triangle_size + 4, current_y - triangle_size - 12), "now", 
+                 fill=COLOR_CURRENT_TIME, font=font_small)
         
-        # Draw current time marker if TDate is today
-        tdate = data.get("T_Date", "")
-        if is_today(tdate):
-            current_time_pos = get_current_time_position()
-            if 0 <= current_time_pos < 24:
-                current_y = timeline_y_start + (current_time_pos / 24.0) * timeline_height
-                
-                # Draw horizontal line marker
-                marker_left = line_x - line_width / 2 - 3
-                marker_right = line_x + line_width / 2 + 9
-                            
-                # Draw triangle pointer to the right of the line
-                triangle_size = 3
-                triangle_points = [
-                    (marker_right, current_y - triangle_size),
-                    (marker_right, current_y + triangle_size),
-                    (marker_right - 2*triangle_size, current_y)
-                ]
-                draw.polygon(triangle_points, fill=COLOR_CURRENT_TIME)
-
-                # Draw "now" label (to the right of the triangle)
-                text_bbox = draw.textbbox((0, 0), "now", font=font_small)
-                text_width = text_bbox[2] - text_bbox[0]
-                draw.text((marker_right + triangle_size + 4, current_y - triangle_size - 12), "now", 
-                         fill=COLOR_CURRENT_TIME, font=font_small)
-                
-                # Draw dashed horizontal line (to the right)
-                draw_dashed_line(draw, 
-                               [(marker_right - 10, current_y), (marker_right + 30, current_y)], 
-                               fill=COLOR_CURRENT_TIME, 
-                               width=1,
-                               dash_length=4,
-                               gap_length=6)
+        # Draw dashed horizontal line (to the right)
+        dash_points = [(marker_right - 10, current_y), (marker_right + 30, current_y)]
     else:
-        # Horizontal orientation (original)
-        # Calculate dimensions
-        timeline_width = width - 2 * MARGIN - 2 * CARD_PADDING
-        timeline_x = MARGIN + CARD_PADDING
-        hour_width = timeline_width / 24
-        line_y = timeline_y + 40  # Y position for the availability line
-        line_height = 6  # Thickness of the line
-        timeline_axis_y = line_y  # Position of the gray timeline axis
-        
-        # Draw gray timeline axis (horizontal line)
-        draw.line([(timeline_x, timeline_axis_y), 
-                   (timeline_x + timeline_width, timeline_axis_y)],
-                  fill=COLOR_TIMELINE, width=2)
-        
-        # Draw hour markers (tick marks and labels)
-        font_small = get_ios_font(10, "regular")
-        tick_length = 8
-        
-        for hour in range(24):
-            x_pos = timeline_x + hour * hour_width
-            
-            # Draw tick mark
-            draw.line([(x_pos, timeline_axis_y - tick_length / 2),
-                       (x_pos, timeline_axis_y + tick_length / 2)],
-                      fill=COLOR_TIMELINE_TICK, width=1)
-            
-            # Draw hour label
-            hour_label = f"{hour:02d}:00"
-            text_bbox = draw.textbbox((0, 0), hour_label, font=font_small)
-            text_width = text_bbox[2] - text_bbox[0]
-            text_x = x_pos - text_width / 2
-            draw.text((text_x, timeline_axis_y + tick_length / 2 + 4), hour_label,
-                     fill=COLOR_SECONDARY_TEXT, font=font_small)
-        
-        # Build line segments
-        line_segments = []
-        
-        for hour in range(24):
-            state = get_hour_state(data, hour)
-            hour_start_x = timeline_x + hour * hour_width
-            hour_end_x = timeline_x + (hour + 1) * hour_width
-            hour_mid_x = timeline_x + hour * hour_width + hour_width / 2
-            
-            if state == "%":
-                # Partial: previous state to middle, next state from middle
-                prev_state = get_previous_state(data, hour)
-                next_state = get_next_state(data, hour)
-                
-                # First half: previous state
-                prev_color = get_state_color(prev_state)
-                line_segments.append({
-                    'start_x': hour_start_x,
-                    'end_x': hour_mid_x,
-                    'color': prev_color
-                })
-                
-                # Second half: next state
-                next_color = get_state_color(next_state)
-                line_segments.append({
-                    'start_x': hour_mid_x,
-                    'end_x': hour_end_x,
-                    'color': next_color
-                })
-            else:
-                # Full hour: single state
-                color = get_state_color(state)
-                line_segments.append({
-                    'start_x': hour_start_x,
-                    'end_x': hour_end_x,
-                    'color': color
-                })
-        
-        # Draw continuous line segments
-        for segment in line_segments:
-            # Draw thick line segment
-            draw.line([(segment['start_x'], line_y),
-                       (segment['end_x'], line_y)],
-                      fill=segment['color'], width=line_height)
+        current_x = current
+        marker_top = line_pos - line_width / 2 - 9
+        
+        # Draw triangle pointer above the line
+        triangle_points = [
+            (current_x - triangle_size, marker_top),
+            (current_x + triangle_size, marker_top),
+            (current_x, marker_top + 2*triangle_size)
+        ]
+        draw.polygon(triangle_points, fill=COLOR_CURRENT_TIME)
         
-        # Draw vertical separators at hour boundaries (subtle)
-        for hour in range(1, 24):
-            x_pos = timeline_x + hour * hour_width
-            draw.line([(x_pos, line_y - line_height / 2 - 2),
-                       (x_pos, line_y + line_height / 2 + 2)],
-                      fill=COLOR_TIMELINE_TICK, width=1)
+        # Draw "now" label
+        draw.text((current_x + triangle_size, marker_top - triangle_size - 10), "now", 
+                 fill=COLOR_CURRENT_TIME, font=font_small)
         
-        # Draw current time marker if TDate is today
-        tdate = data.get("T_Date", "")
-        if is_today(tdate):
-            current_time_pos = get_current_time_position()
-            if 0 <= current_time_pos < 24:
-                current_x = timeline_x + (current_time_pos / 24.0) * timeline_width
-                
-                # Draw vertical line marker
-                marker_top = line_y - line_height / 2 - 9
-                marker_bottom = line_y + line_height / 2 - 3
-                            
-                # Draw triangle pointer above the line
-                triangle_size = 3
-                triangle_points = [
-                    (current_x - triangle_size, marker_top),
-                    (current_x + triangle_size, marker_top),
-                    (current_x, marker_top + 2*triangle_size)
-                ]
-                draw.polygon(triangle_points, fill=COLOR_CURRENT_TIME)
-
-                # Draw "now" label
-                draw.text((current_x + triangle_size, marker_top - triangle_size - 10), "now", 
-                         fill=COLOR_CURRENT_TIME, font=font_small)
-                
-                # Draw dashed vertical line
-                draw_dashed_line(draw, 
-                               [(current_x, marker_top - 30), (current_x, marker_top + 40)], 
-                               fill=COLOR_CURRENT_TIME, 
-                               width=1,
-                               dash_length=4,
-                               gap_length=6)
+        # Draw dashed vertical line
+        dash_points = [(current_x, marker_top - 30), (current_x, marker_top + 40)]
+    
+    draw_dashed_line(draw, dash_points, fill=COLOR_CURRENT_TIME, width=1,
+                     dash_length=4, gap_length=6)
 
 
-def generate_image(data, output_path="grid_availability.png", vertical=False):
-    """Generate the electricity grid availability image.
+def get_image_size(vertical=False):
+    """Get the (width, height) of the image for the given orientation."""
+    if vertical:
+        return 250, 1024
+    return WIDTH, HEIGHT
+
+
+def get_timeline_card_box(img_width, img_height, separator_y, vertical=False):
+    """Get the timeline card box as (x, y, width, height) below the separator line."""
+    timeline_card_y = separator_y + 8
+    if vertical:
+        # Calculate legend height: 2 items * 20px spacing + padding
+        legend_height = 2 * 20 + 16
+        timeline_card_height = img_height - timeline_card_y - MARGIN - legend_height
+    else:
+        timeline_card_height = 80
+    timeline_card_x = MARGIN + CARD_PADDING
+    timeline_card_width = img_width - 2 * MARGIN - 2 * CARD_PADDING
+    return timeline_card_x, timeline_card_y, timeline_card_width, timeline_card_height
+
+
+@lru_cache(maxsize=8)
+def get_base_image(vertical=False, separator_y=MARGIN + 42):
+    """Render the static layer shared by all images of one layout (cached).
+    
+    Contains the card background, separator line, timeline card, timeline
+    axis with hour ticks/labels and the legend. Callers must copy it before
+    drawing on top.
     
     Args:
-        data: Dictionary containing grid availability data
-        output_path: Path to save the image
-        vertical: If True, generate vertical image (250x1024px), else horizontal (1024x250px)
+        vertical: If True, build the vertical layout (250x1024px)
+        separator_y: Y position of the separator line below the date
     """
-    # Set dimensions based on orientation
-    if vertical:
-        img_width = 250
-        img_height = 1024
-    else:
-        img_width = WIDTH
-        img_height = HEIGHT
+    img_width, img_height = get_image_size(vertical)
     
     # Create image with iOS background color
     img = Image.new('RGB', (img_width, img_height), COLOR_BACKGROUND)
     draw = ImageDraw.Draw(img)
     
-    # Get date from data
-    tdate = data.get("T_Date", "Unknown Date")
-    
     # Draw main card with rounded corners
     card_x = MARGIN
     card_y = MARGIN
@@ -462,36 +465,17 @@ def generate_image(data, output_path="grid_availability.png", vertical=False):
         fill=COLOR_CARD_BACKGROUND
     )
     
-    if vertical:
-        # Vertical layout
-        # Draw date only (no title)
-        font_date = get_ios_font(14, "semibold")
-        
-        date_text = tdate
-        
-        date_bbox = draw.textbbox((0, 0), date_text, font=font_date)
-        date_height = date_bbox[3] - date_bbox[1]
-        date_width = date_bbox[2] - date_bbox[0]
-        date_x = (img_width - date_width) / 2
-        date_y = MARGIN + 16
-        
-        draw.text((date_x, date_y), date_text, 
-                 fill=COLOR_PRIMARY_TEXT, font=font_date)
-        
-        # Draw separator line (horizontal)
-        separator_y = date_y + date_height + 12
-        draw.line([(MARGIN + CARD_PADDING, separator_y), 
-                   (img_width - MARGIN - CARD_PADDING, separator_y)],
-                  fill=COLOR_SEPARATOR, width=1)
-        
-        # Draw timeline card (vertical)
-        timeline_card_y = separator_y + 8
-        # Calculate legend height: 2 items * 20px spacing + padding
-        legend_height = 2 * 20 + 16
-        timeline_card_height = img_height - timeline_card_y - MARGIN - legend_height
-        timeline_card_x = MARGIN + CARD_PADDING
-        timeline_card_width = img_width - 2 * MARGIN - 2 * CARD_PADDING
-        
+    # Draw separator line
+    draw.line([(MARGIN + CARD_PADDING, separator_y), 
+               (img_width - MARGIN - CARD_PADDING, separator_y)],
+              fill=COLOR_SEPARATOR, width=1)
+    
+    # Draw timeline card
+    timeline_card_x, timeline_card_y, timeline_card_width, timeline_card_height = \
+        get_timeline_card_box(img_width, img_height, separator_y, vertical)
+    
+    # The timeline card is only visible if its color differs from the card behind it
+    if COLOR_BACKGROUND != COLOR_CARD_BACKGROUND:
         draw_rounded_rectangle(
             draw,
             [timeline_card_x, timeline_card_y, 
@@ -500,20 +484,22 @@ def generate_image(data, output_path="grid_availability.png", vertical=False):
             8,
             fill=COLOR_BACKGROUND
         )
-        
-        # Draw timeline (vertical)
-        timeline_content_y = timeline_card_y + 8
-        draw_timeline(draw, data, tdate, timeline_content_y, img_width, img_height, vertical=True, timeline_card_height=timeline_card_height)
-        
+    
+    # Draw timeline axis, ticks and hour labels
+    timeline_content_y = timeline_card_y + 8
+    draw_timeline_axis(draw, timeline_content_y, img_width, img_height, vertical=vertical,
+                       timeline_card_height=timeline_card_height if vertical else None)
+    
+    legend_items = [
+        ("Available", COLOR_AVAILABLE),
+        ("Not Available", COLOR_UNAVAILABLE),
+    ]
+    
+    if vertical:
         # Draw legend with iOS style (vertical layout - stacked)
         legend_y = timeline_card_y + timeline_card_height + 8
         legend_x = MARGIN + CARD_PADDING
         
-        legend_items = [
-            ("Available", COLOR_AVAILABLE),
-            ("Not Available", COLOR_UNAVAILABLE),
-        ]
-        
         font_legend = get_ios_font(11, "regular")
         line_indicator_width = 30
         line_indicator_height = 3
@@ -530,52 +516,10 @@ def generate_image(data, output_path="grid_availability.png", vertical=False):
             draw.text((indicator_x + line_indicator_width + 8, indicator_y - 6), label, 
                      fill=COLOR_PRIMARY_TEXT, font=font_legend)
     else:
-        # Horizontal layout (original)
-        # Draw date only (no title)
-        font_date = get_ios_font(18, "semibold")
-        
-        date_text = tdate
-        
-        date_bbox = draw.textbbox((0, 0), date_text, font=font_date)
-        date_width = date_bbox[2] - date_bbox[0]
-        date_x = (img_width - date_width) / 2
-        
-        draw.text((date_x, MARGIN + 16), date_text, fill=COLOR_PRIMARY_TEXT, font=font_date)
-        
-        # Draw separator line
-        separator_y = MARGIN + 42
-        draw.line([(MARGIN + CARD_PADDING, separator_y), 
-                   (img_width - MARGIN - CARD_PADDING, separator_y)],
-                  fill=COLOR_SEPARATOR, width=1)
-        
-        # Draw timeline card
-        timeline_card_y = separator_y + 8
-        timeline_card_height = 80
-        timeline_card_x = MARGIN + CARD_PADDING
-        timeline_card_width = img_width - 2 * MARGIN - 2 * CARD_PADDING
-        
-        draw_rounded_rectangle(
-            draw,
-            [timeline_card_x, timeline_card_y, 
-             timeline_card_x + timeline_card_width, 
-             timeline_card_y + timeline_card_height],
-            8,
-            fill=COLOR_BACKGROUND
-        )
-        
-        # Draw timeline
-        timeline_content_y = timeline_card_y + 8
-        draw_timeline(draw, data, tdate, timeline_content_y, img_width, img_height, vertical=False)
-        
         # Draw legend with iOS style (no symbols, just colored lines)
         legend_y = timeline_card_y + timeline_card_height + 12
         legend_x = MARGIN + CARD_PADDING
         
-        legend_items = [
-            ("Available", COLOR_AVAILABLE),
-            ("Not Available", COLOR_UNAVAILABLE),
-        ]
-        
         font_legend = get_ios_font(13, "regular")
         line_indicator_width = 40
         line_indicator_height = 4
@@ -592,15 +536,165 @@ def generate_image(data, output_path="grid_availability.png", vertical=False):
                      fill=COLOR_PRIMARY_TEXT, font=font_legend)
             
             # Calculate next position
-            label_bbox = draw.textbbox((0, 0), label, font=font_legend)
-            label_width = label_bbox[2] - label_bbox[0]
+            label_width = draw.textlength(label, font=font_legend)
             legend_x += line_indicator_width + 10 + label_width + 20
     
-    # Save image
-    img.save(output_path)
+    return img
+
+
+def render_image(data, vertical=False, current_time_pos=None):
+    """Render the electricity grid availability image and return it as a PIL Image.
+    
+    The static layer comes from the cached get_base_image; only the date,
+    the availability line and the current time marker are drawn per call.
+    
+    Args:
+        data: Dictionary containing grid availability data
+        vertical: If True, render vertical image (250x1024px), else horizontal (1024x250px)
+        current_time_pos: Position of the "now" marker (0.0 to 24.0), or None for no marker
+    """
+    # Set dimensions based on orientation
+    img_width, img_height = get_image_size(vertical)
+    
+    # Get date from data
+    tdate = data.get("T_Date", "Unknown Date")
+    
+    # Measure date only (no title)
+    if vertical:
+        font_date = get_ios_font(14, "semibold")
+        date_bbox = font_date.getbbox(tdate)
+        date_height = date_bbox[3] - date_bbox[1]
+        date_y = MARGIN + 16
+        # Separator line (horizontal) sits below the date
+        separator_y = date_y + date_height + 12
+    else:
+        font_date = get_ios_font(18, "semibold")
+        date_y = MARGIN + 16
+        separator_y = MARGIN + 42
+    
+    date_width = font_date.getlength(tdate)
+    date_x = (img_width - date_width) / 2
+    
+    # Start from a copy of the cached static layer
+    img = get_base_image(vertical, separator_y).copy()
+    draw = ImageDraw.Draw(img)
+    
+    # Draw date
+    draw.text((date_x, date_y), tdate, fill=COLOR_PRIMARY_TEXT, font=font_date)
+    
+    # Draw timeline
+    _, timeline_card_y, _, timeline_card_height = \
+        get_timeline_card_box(img_width, img_height, separator_y, vertical)
+    timeline_content_y = timeline_card_y + 8
+    draw_timeline(draw, data, timeline_content_y, img_width, img_height, vertical=vertical,
+                  timeline_card_height=timeline_card_height if vertical else None,
+                  current_time_pos=current_time_pos)
+    
+    return img
+
+
+def warm_caches():
+    """Load fonts and build the cached masks and base layers for both orientations.
+    
+    Servers call this at startup so the first request does not pay for it.
+    """
+    data = {"T_Date": "01-01-2000", "T_00": "●", "T_01": "✕", "T_02": "%", "T_03": "-"}
+    for vertical in (False, True):
+        render_image(data, vertical=vertical, current_time_pos=12.0)
+
+
+@lru_cache(maxsize=IMAGE_CACHE_SIZE)
+def render_png(data_key, vertical=False, current_time_pos=None):
+    """Render the image for canonical JSON data and return PNG bytes (cached).
+    
+    Args:
+        data_key: Grid data serialized with json.dumps(..., sort_keys=True)
+        vertical: If True, render vertical image (250x1024px)
+        current_time_pos: Position of the "now" marker when T_Date is today, else None.
+            Minute resolution, so the cache entry for today changes every minute.
+    """
+    img = render_image(json.loads(data_key), vertical=vertical, current_time_pos=current_time_pos)
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+    return buffer.getvalue()
+
+
+def get_image_key(data, vertical=False):
+    """Get the render_png arguments identifying the image for data.
+    
+    Returns (canonical JSON of data, vertical, "now" marker position or None).
+    """
+    current_time_pos = get_marker_position(data.get("T_Date", ""))
+    return json.dumps(data, sort_keys=True, ensure_ascii=False), vertical, current_time_pos
+
+
+def generate_image_bytes(data, vertical=False):
+    """Generate the electricity grid availability image as PNG bytes.
+    
+    Identical input data returns the memoized PNG; for today's date the
+    cache entry is additionally keyed by the current time marker position.
+    
+    Args:
+        data: Dictionary containing grid availability data
+        vertical: If True, generate vertical image (250x1024px), else horizontal (1024x250px)
+    """
+    return render_png(*get_image_key(data, vertical=vertical))
+
+
+def generate_image(data, output_path="grid_availability.png", vertical=False):
+    """Generate the electricity grid availability image.
+    
+    PNG output is served from the generate_image_bytes cache; other formats
+    (chosen by the output_path extension) are rendered and saved by PIL.
+    
+    Args:
+        data: Dictionary containing grid availability data
+        output_path: Path to save the image
+        vertical: If True, generate vertical image (250x1024px), else horizontal (1024x250px)
+    """
+    if os.path.splitext(output_path)[1].lower() == ".png":
+        with open(output_path, "wb") as img_file:
+            img_file.write(generate_image_bytes(data, vertical=vertical))
+    else:
+        current_time_pos = get_marker_position(data.get("T_Date", ""))
+        render_image(data, vertical=vertical, current_time_pos=current_time_pos).save(output_path)
     print(f"Image saved to: {output_path}")
 
 
+def generate_batch_item(item):
+    """Generate one (data, output_path, vertical) batch item; runs in a worker process."""
+    data, output_path, vertical = item
+    generate_image(data, output_path, vertical=vertical)
+    return output_path
+
+
+def generate_batch(items, vertical=False, workers=None):
+    """Generate many images in parallel worker processes.
+    
+    Rendering is CPU-bound and holds the GIL for most of its work, so
+    images are spread over a process pool. Each worker keeps its own
+    font and base image caches for all the images it renders.
+    
+    Args:
+        items: Iterable of (data, output_path) or (data, output_path, vertical) tuples
+        vertical: Default orientation for items without their own vertical flag
+        workers: Number of worker processes (defaults to the CPU count)
+    
+    Returns:
+        List of output paths in input order
+    """
+    jobs = [(item[0], item[1], item[2] if len(item) > 2 else vertical) for item in items]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(generate_batch_item, jobs))
+
+
+def load_json(raw):
+    """Parse JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
 def main():
     """Main function to process input and generate image."""
     # Example data (can be overridden by command line argument)
@@ -617,21 +711,35 @@ def main():
     if vertical:
         sys.argv = [arg for arg in sys.argv if arg not in ["--vertical", "-v"]]
     
+    # Check for batch flag: input is a JSON array of
+    # {"grid_data": {...}, "output_path": "...", "vertical": bool} jobs
+    batch = "--batch" in sys.argv
+    if batch:
+        sys.argv = [arg for arg in sys.argv if arg != "--batch"]
+        if len(sys.argv) < 2:
+            print("--batch requires a JSON jobs file or '-' for stdin.")
+            sys.exit(1)
+    
     if len(sys.argv) > 1:
         # Read JSON from file or stdin
         input_source = sys.argv[1]
         if input_source == "-":
             # Read from stdin
-            data = json.load(sys.stdin)
+            data = load_json(sys.stdin.buffer.read())
         else:
             # Read from file
-            with open(input_source, 'r') as f:
-                data = json.load(f)
+            with open(input_source, 'rb') as f:
+                data = load_json(f.read())
     else:
         # Use example data
         data = example_data
         print("Using example data. Provide JSON file as argument or pipe JSON via stdin.")
     
+    if batch:
+        items = [(job["grid_data"], job["output_path"], job.get("vertical", vertical)) for job in data]
+        generate_batch(items, vertical=vertical)
+        return
+    
     # Determine output path
     output_path = sys.argv[2] if len(sys.argv) > 2 else "grid_availability.png"
     
@@ -5,23 +5,96 @@ Exposes the MCP server via HTTP/REST API for integration with n8n and other HTTP
 FastMCP handles HTTP/SSE transport automatically via mcp.run(transport="http").
 """
 
-import base64
-import tempfile
-from typing import Optional
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import JSONResponse, Response
+import asyncio
+import hashlib
+import json
+import os
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Annotated, List, Optional
+from fastapi import Body, FastAPI, Header, HTTPException, Query
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel, Field
 import uvicorn
 
-from mcp_server import GridData
-from generate_grid_image import generate_image
+from fastmcp import FastMCP
+from fastmcp.utilities.types import Image
+
+try:
+    # Optional SIMD base64 encoder for the return_base64 responses
+    from pybase64 import b64encode
+except ImportError:
+    from base64 import b64encode
+
+from mcp_server import GridData, grid_data_to_dict, is_valid_date, tool_grid_data_dict
+from generate_grid_image import IMAGE_CACHE_SIZE, RENDERER_VERSION, get_image_key, render_png, warm_caches
+
+# Browser/proxy cache lifetime for generated images; today's images carry the
+# "now" marker, which moves every minute
+IMAGE_MAX_AGE = 3600
+TODAY_IMAGE_MAX_AGE = 60
+
+# Upper bound on the number of items in one batch request
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", 32))
+
+# MCP tools for remote clients. Unlike the mcp_server.py tools they take no
+# output_path and never write files: images are rendered in memory (through the
+# same cache as the REST endpoints) and returned as image content.
+http_mcp = FastMCP("Grid Image Generator")
+
+
+@http_mcp.tool()
+async def generate_grid_availability_image(
+    grid_data: GridData,
+    vertical: bool = Field(False, description="If true, generate vertical image (250x1024px). If false, generate horizontal image (1024x250px).")
+) -> Image:
+    """Generate a PNG image showing electricity grid availability for a given date.
+    
+    The image follows iOS design guidelines and can be generated in horizontal (1024x250px) 
+    or vertical (250x1024px) orientation.
+    
+    Input data should be a JSON object with T_Date (format: DD-MM-YYYY) and T_00 through T_23 
+    keys with values: '●' (available), '✕' (unavailable), '%' (partial/transition), or '-' (unknown).
+    """
+    image_key = get_image_key(tool_grid_data_dict(grid_data), vertical=vertical)
+    return Image(data=await asyncio.to_thread(render_png, *image_key), format="png")
+
+
+@http_mcp.tool()
+async def generate_grid_availability_image_vertical(grid_data: GridData) -> Image:
+    """Generate a vertical-oriented PNG image showing electricity grid availability for a given date.
+    
+    The image is 250x1024px (vertical) and follows iOS design guidelines.
+    
+    Input data should be a JSON object with T_Date (format: DD-MM-YYYY) and T_00 through T_23 
+    keys with values: '●' (available), '✕' (unavailable), '%' (partial/transition), or '-' (unknown).
+    """
+    image_key = get_image_key(tool_grid_data_dict(grid_data), vertical=True)
+    return Image(data=await asyncio.to_thread(render_png, *image_key), format="png")
+
+
+# MCP protocol (streamable HTTP) endpoint, mounted at /mcp next to the REST
+# endpoints; stateless (honoured since fastmcp 2.9) so any uvicorn worker can
+# answer any request
+mcp_app = http_mcp.http_app(path="/", stateless_http=True)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Start the MCP session manager and warm the renderer caches before serving requests."""
+    async with mcp_app.lifespan(app):
+        warm_caches()
+        yield
+
 
 # Create FastAPI app for REST endpoints
 app = FastAPI(
     title="Grid Image Generator MCP Server",
     description="HTTP API wrapper for the Grid Availability Image Generator MCP Server",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware for SSE support
@@ -33,6 +106,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON responses (mostly the base64 image payloads); Starlette >= 1.5
+# leaves already compressed image/png and streamed text/event-stream (/mcp)
+# responses alone
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 
 class GenerateImageRequest(BaseModel):
     """Request model for image generation."""
@@ -41,149 +119,244 @@ class GenerateImageRequest(BaseModel):
     vertical: bool = Field(False, description="If true, generate vertical image (250x1024px). If false, generate horizontal image (1024x250px).")
 
 
+# Static responses, serialized once at import time
+API_INFO = {
+    "name": "Grid Image Generator MCP Server",
+    "version": "1.0.0",
+    "description": "HTTP API wrapper for generating electricity grid availability images",
+    "endpoints": {
+        "/health": "Health check endpoint",
+        "/tools": "List available tools",
+        "/tools/generate_grid_availability_image": "Generate grid availability image",
+        "/tools/generate_grid_availability_image/batch": "Generate several grid availability images as base64",
+        "/generate": "Simplified endpoint for n8n integration",
+        "/mcp": "MCP protocol endpoint (streamable HTTP)"
+    },
+    "note": "MCP clients can connect to /mcp/, whose tools return images inline; mcp_server.py still runs standalone with stdio, http or sse transport"
+}
+
+HEALTH_STATUS = {"status": "healthy", "service": "grid-image-generator"}
+
+TOOLS = {
+    "tools": [
+        {
+            "name": "generate_grid_availability_image",
+            "description": "Generate an image showing electricity grid availability for a given date. "
+                           "The image is 1024x250px (horizontal) or 250x1024px (vertical) and follows iOS design guidelines.",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "grid_data": {"type": "object"},
+                    "vertical": {"type": "boolean", "default": False},
+                    "return_base64": {"type": "boolean", "default": False}
+                },
+                "required": ["grid_data"]
+            }
+        },
+        {
+            "name": "generate_grid_availability_image_vertical",
+            "description": "Generate a vertical-oriented image (250x1024px) showing electricity grid availability.",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "grid_data": {"type": "object"},
+                    "return_base64": {"type": "boolean", "default": False}
+                },
+                "required": ["grid_data"]
+            }
+        }
+    ]
+}
+
+
+def json_bytes(content):
+    """Serialize a static response body the same way JSONResponse does."""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+API_INFO_JSON = json_bytes(API_INFO)
+HEALTH_STATUS_JSON = json_bytes(HEALTH_STATUS)
+TOOLS_JSON = json_bytes(TOOLS)
+
+
+def base64_response_body(image_size, image_base64):
+    """Build the return_base64 JSON body around already encoded base64 bytes.
+    
+    Base64 output never needs JSON escaping, so the bytes are spliced in
+    verbatim instead of being decoded to str and re-encoded by JSONResponse.
+    """
+    return b"".join((
+        json_bytes({
+            "success": True,
+            "message": "Grid availability image generated successfully",
+            "image_size": image_size,
+        })[:-1],
+        b',"image_base64":"',
+        image_base64,
+        b'","mime_type":"image/png"}',
+    ))
+
+
+@lru_cache(maxsize=IMAGE_CACHE_SIZE)
+def render_base64_body(data_key, vertical=False, current_time_pos=None):
+    """Get the return_base64 JSON body for a render_png key.
+    
+    Memoized alongside render_png so repeated base64 requests skip the encode.
+    """
+    image_size = "250x1024px" if vertical else "1024x250px"
+    return base64_response_body(image_size, b64encode(render_png(data_key, vertical, current_time_pos)))
+
+
+def image_etag(image_key, return_base64):
+    """Get the ETag for a generated image response.
+    
+    Images are a pure function of their render cache key and the renderer
+    version, so those (plus the response format) identify the response body.
+    The return_base64 JSON body may be gzip-encoded by GZipMiddleware, so it
+    gets a weak ETag; the PNG is never re-encoded and keeps a strong one.
+    """
+    digest = hashlib.blake2b(
+        repr((RENDERER_VERSION, image_key, return_base64)).encode("utf-8"), digest_size=16
+    )
+    etag = f'"{digest.hexdigest()}"'
+    return f"W/{etag}" if return_base64 else etag
+
+
+def etag_matches(etag, if_none_match):
+    """Check an If-None-Match header value against an ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
 @app.get("/")
 async def root():
     """Root endpoint with API information."""
-    return {
-        "name": "Grid Image Generator MCP Server",
-        "version": "1.0.0",
-        "description": "HTTP API wrapper for generating electricity grid availability images",
-        "endpoints": {
-            "/health": "Health check endpoint",
-            "/tools": "List available tools",
-            "/tools/generate_grid_availability_image": "Generate grid availability image",
-            "/generate": "Simplified endpoint for n8n integration"
-        },
-        "note": "For MCP protocol endpoints, run mcp_server.py with transport='http' or use FastMCP's built-in HTTP transport"
-    }
+    return Response(content=API_INFO_JSON, media_type="application/json")
 
 
 @app.get("/health")
 async def health():
     """Health check endpoint."""
-    return {"status": "healthy", "service": "grid-image-generator"}
+    return Response(content=HEALTH_STATUS_JSON, media_type="application/json")
 
 
 @app.get("/tools")
 async def list_tools():
     """List available tools (MCP-compatible)."""
-    return {
-        "tools": [
-            {
-                "name": "generate_grid_availability_image",
-                "description": "Generate an image showing electricity grid availability for a given date. "
-                               "The image is 1024x250px (horizontal) or 250x1024px (vertical) and follows iOS design guidelines.",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "grid_data": {"type": "object"},
-                        "vertical": {"type": "boolean", "default": False},
-                        "return_base64": {"type": "boolean", "default": False}
-                    },
-                    "required": ["grid_data"]
-                }
-            },
-            {
-                "name": "generate_grid_availability_image_vertical",
-                "description": "Generate a vertical-oriented image (250x1024px) showing electricity grid availability.",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "grid_data": {"type": "object"},
-                        "return_base64": {"type": "boolean", "default": False}
-                    },
-                    "required": ["grid_data"]
-                }
-            }
-        ]
-    }
+    return Response(content=TOOLS_JSON, media_type="application/json")
 
 
 @app.post("/tools/generate_grid_availability_image")
+@app.post("/generate")
 async def generate_grid_availability_image_rest(
     request: GenerateImageRequest,
-    vertical: bool = Query(False, description="If true, generate vertical image (250x1024px)")
+    vertical: bool = Query(False, description="If true, generate vertical image (250x1024px)"),
+    if_none_match: Optional[str] = Header(None)
 ):
     """Generate grid availability image.
     
-    Supports vertical parameter both in request body and as query parameter.
-    Query parameter takes precedence if both are provided.
+    Also served as /generate, the simplified endpoint for n8n integration.
+    Supports vertical parameter both in request body and as query parameter
+    (e.g. POST /generate?vertical=true). Query parameter takes precedence if both are provided.
+    Responses carry an ETag; a matching If-None-Match returns 304 without rendering.
     """
     try:
         # Override vertical from query parameter if provided
         is_vertical = vertical or request.vertical
         
         # Convert Pydantic model to dict (compatible with both v1 and v2)
-        try:
-            # Pydantic v2
-            grid_data_dict = request.grid_data.model_dump(exclude_none=True)
-        except AttributeError:
-            # Pydantic v1 fallback
-            grid_data_dict = request.grid_data.dict(exclude_none=True)
-        
-        # Validate required fields
-        if "T_Date" not in grid_data_dict:
-            raise HTTPException(status_code=400, detail="T_Date is required in grid_data")
-        
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp_file:
-            output_path = tmp_file.name
+        grid_data_dict = grid_data_to_dict(request.grid_data)
         
-        # Generate the image (with vertical parameter)
-        generate_image(grid_data_dict, output_path, vertical=is_vertical)
+        # Validate the date format (GridData already requires T_Date)
+        if not is_valid_date(grid_data_dict["T_Date"]):
+            raise HTTPException(status_code=400, detail="T_Date must be in DD-MM-YYYY format")
         
-        # Determine image size string
-        image_size = "250x1024px" if is_vertical else "1024x250px"
+        # Answer repeated requests from the client's cache
+        image_key = get_image_key(grid_data_dict, vertical=is_vertical)
+        max_age = IMAGE_MAX_AGE if image_key[2] is None else TODAY_IMAGE_MAX_AGE
+        cache_headers = {
+            "ETag": image_etag(image_key, request.return_base64),
+            "Cache-Control": f"public, max-age={max_age}"
+        }
+        if etag_matches(cache_headers["ETag"], if_none_match):
+            return Response(status_code=304, headers=cache_headers)
         
+        # Generate the PNG in memory (with vertical parameter) off the event loop
         if request.return_base64:
-            # Read image and convert to base64
-            with open(output_path, "rb") as img_file:
-                image_data = img_file.read()
-                base64_data = base64.b64encode(image_data).decode("utf-8")
-            
-            return JSONResponse(content={
-                "success": True,
-                "message": "Grid availability image generated successfully",
-                "image_size": image_size,
-                "image_base64": base64_data,
-                "mime_type": "image/png"
-            })
+            # Return image as base64
+            return Response(
+                content=await asyncio.to_thread(render_base64_body, *image_key),
+                media_type="application/json",
+                headers=cache_headers
+            )
         else:
             # Return image as binary
-            with open(output_path, "rb") as img_file:
-                image_data = img_file.read()
-            
             return Response(
-                content=image_data,
+                content=await asyncio.to_thread(render_png, *image_key),
                 media_type="image/png",
                 headers={
+                    **cache_headers,
+                    "X-Content-Type-Options": "nosniff",
                     "Content-Disposition": f"attachment; filename=grid_availability_{grid_data_dict['T_Date'].replace('-', '_')}.png"
                 }
             )
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating grid image: {str(e)}")
 
 
-@app.post("/generate")
-async def generate_simple(
-    request: GenerateImageRequest,
-    vertical: bool = Query(False, description="If true, generate vertical image (250x1024px)")
+@app.post("/tools/generate_grid_availability_image/batch")
+async def generate_grid_availability_image_batch(
+    items: Annotated[List[GenerateImageRequest], Body(max_length=MAX_BATCH_SIZE)],
+    vertical: bool = Query(False, description="If true, generate vertical images (250x1024px)")
 ):
-    """Simplified endpoint for n8n integration.
+    """Generate several grid availability images in one request.
     
-    Supports vertical parameter as query parameter for easier integration.
-    Example: POST /generate?vertical=true
+    Returns a JSON array with one base64 result per item, in request order, shaped
+    like the return_base64 response of the single image endpoint. Identical items
+    are rendered once; distinct ones are rendered concurrently. Batches larger than
+    MAX_BATCH_SIZE are rejected with 422.
     """
-    return await generate_grid_availability_image_rest(request, vertical=vertical)
+    try:
+        grid_data_dicts = [grid_data_to_dict(item.grid_data) for item in items]
+        if not all(is_valid_date(grid_data_dict["T_Date"]) for grid_data_dict in grid_data_dicts):
+            raise HTTPException(status_code=400, detail="T_Date must be in DD-MM-YYYY format")
+        
+        image_keys = [
+            get_image_key(grid_data_dict, vertical=vertical or item.vertical)
+            for grid_data_dict, item in zip(grid_data_dicts, items)
+        ]
+        unique_keys = list(dict.fromkeys(image_keys))
+        unique_bodies = await asyncio.gather(*(asyncio.to_thread(render_base64_body, *key) for key in unique_keys))
+        
+        bodies = dict(zip(unique_keys, unique_bodies))
+        return Response(
+            content=b"[" + b",".join(bodies[key] for key in image_keys) + b"]",
+            media_type="application/json"
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating grid images: {str(e)}")
+
+
+# Mounted under its own prefix so FastAPI's 404/405 handling of the REST routes is unaffected
+app.mount("/mcp", mcp_app)
 
 
 if __name__ == "__main__":
-    import os
     port = int(os.getenv("PORT", 8000))
     host = os.getenv("HOST", "0.0.0.0")
+    workers = int(os.getenv("WORKERS", 1))
+    # Serve on a Unix domain socket instead of TCP when set (e.g. behind a local reverse proxy)
+    uds = os.getenv("UDS") or None
     
-    # Run FastAPI app with REST endpoints
-    # For MCP protocol endpoints, run: python mcp_server.py with transport="http"
-    # or use FastMCP's built-in HTTP transport: mcp.run(transport="http", host=host, port=port)
-    uvicorn.run(app, host=host, port=port)
+    # Run FastAPI app with REST endpoints and the MCP endpoint at /mcp
+    # uvicorn[standard] provides uvloop and httptools, which loop/http "auto" picks up;
+    # multiple worker processes need the app as an import string
+    uvicorn.run("mcp_http_server:app", host=host, port=port, uds=uds, workers=workers)
@@ -4,13 +4,21 @@ MCP Server for Electricity Grid Availability Image Generator
 Exposes the grid image generation functionality as an MCP tool using FastMCP.
 """
 
-import base64
+import re
 import tempfile
+from functools import lru_cache
 from typing import Optional
 from pydantic import BaseModel, Field
 
 from fastmcp import FastMCP
-from generate_grid_image import generate_image
+
+try:
+    # Optional SIMD base64 encoder for the return_base64 results
+    from pybase64 import b64encode
+except ImportError:
+    from base64 import b64encode
+
+from generate_grid_image import generate_image, generate_image_bytes, warm_caches
 
 # Create the FastMCP server
 mcp = FastMCP("Grid Image Generator")
@@ -45,48 +53,82 @@ class GridData(BaseModel):
     T_23: Optional[str] = None
 
 
-@mcp.tool()
-def generate_grid_availability_image(
-    grid_data: GridData,
-    output_path: Optional[str] = Field(None, description="Optional output file path. If not provided, a temporary file will be used."),
-    return_base64: bool = Field(False, description="If true, return the image as a base64-encoded string. If false, return the file path."),
-    vertical: bool = Field(False, description="If true, generate vertical image (250x1024px). If false, generate horizontal image (1024x250px).")
-) -> str:
-    """Generate an image showing electricity grid availability for a given date.
-    
-    The image follows iOS design guidelines and can be generated in horizontal (1024x250px) 
-    or vertical (250x1024px) orientation.
+# T_Date format (DD-MM-YYYY, ASCII digits only), checked before rendering or
+# building file names and the Content-Disposition header
+T_DATE_PATTERN = re.compile(r"[0-9]{2}-[0-9]{2}-[0-9]{4}")
+
+
+def is_valid_date(tdate):
+    """Check that a T_Date value is in DD-MM-YYYY format."""
+    return T_DATE_PATTERN.fullmatch(tdate) is not None
+
+
+# Pydantic v2 renamed .dict() to .model_dump(); resolve the method name once
+GRID_DATA_DUMP = "model_dump" if hasattr(GridData, "model_dump") else "dict"
+
+
+def grid_data_to_dict(grid_data):
+    """Convert a GridData model to a dict, leaving out unset hours."""
+    return getattr(grid_data, GRID_DATA_DUMP)(exclude_none=True)
+
+
+@lru_cache(maxsize=None)
+def get_output_dir():
+    """Get the directory for tool images without an output_path.
     
-    Input data should be a JSON object with T_Date (format: DD-MM-YYYY) and T_00 through T_23 
-    keys with values: '●' (available), '✕' (unavailable), '%' (partial/transition), or '-' (unknown).
+    Created on first use and removed with its files when the server exits.
     """
-    # Convert Pydantic model to dict
-    try:
-        grid_data_dict = grid_data.model_dump(exclude_none=True)
-    except AttributeError:
-        # Pydantic v1 fallback
-        grid_data_dict = grid_data.dict(exclude_none=True)
+    return tempfile.TemporaryDirectory(prefix="grid_availability_")
+
+
+def generate_tool_image(grid_data_dict, output_path, return_base64, vertical):
+    """Generate the image for a tool call.
     
-    # Validate required fields
-    if "T_Date" not in grid_data_dict:
-        raise ValueError("T_Date is required in grid_data")
+    Returns (output_path, PNG bytes if return_base64 else None). Base64 results
+    without an output_path are rendered in memory and never touch the disk; a
+    temporary file is only created when a file path has to be returned.
+    """
+    if return_base64 and output_path is None:
+        return None, generate_image_bytes(grid_data_dict, vertical=vertical)
     
     # Create temporary file if no output path provided
     if output_path is None:
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp_file:
+        with tempfile.NamedTemporaryFile(suffix=".png", delete=False, dir=get_output_dir().name) as tmp_file:
             output_path = tmp_file.name
     
-    # Generate the image
     generate_image(grid_data_dict, output_path, vertical=vertical)
     
+    if not return_base64:
+        return output_path, None
+    with open(output_path, "rb") as img_file:
+        return output_path, img_file.read()
+
+
+def tool_grid_data_dict(grid_data):
+    """Convert a tool's GridData argument to a dict, rejecting malformed dates."""
+    # Convert Pydantic model to dict
+    grid_data_dict = grid_data_to_dict(grid_data)
+    
+    # Validate the date format (GridData already requires T_Date)
+    if not is_valid_date(grid_data_dict["T_Date"]):
+        raise ValueError("T_Date must be in DD-MM-YYYY format")
+    return grid_data_dict
+
+
+def run_image_tool(grid_data, output_path, return_base64, vertical):
+    """Shared implementation of the image tools; returns the tool result message."""
+    grid_data_dict = tool_grid_data_dict(grid_data)
+    
+    # Generate the image
+    output_path, image_data = generate_tool_image(grid_data_dict, output_path, return_base64, vertical=vertical)
+    
     # Determine image size
     image_size = "250x1024px" if vertical else "1024x250px"
     
     if return_base64:
-        # Read image and convert to base64
-        with open(output_path, "rb") as img_file:
-            image_data = img_file.read()
-            base64_data = base64.b64encode(image_data).decode("utf-8")
+        # Only a 50 character preview is returned, so encode just the leading
+        # bytes (39 bytes encode to the same first 52 base64 characters)
+        base64_data = b64encode(image_data[:39]).decode("ascii")
         
         # Return base64 data (FastMCP will handle image content automatically if we return it properly)
         return f"Grid availability image generated successfully. Image size: {image_size}. Base64 data: {base64_data[:50]}..."
@@ -94,6 +136,24 @@ def generate_grid_availability_image(
         return f"Grid availability image generated successfully at: {output_path}. Image size: {image_size}"
 
 
+@mcp.tool()
+def generate_grid_availability_image(
+    grid_data: GridData,
+    output_path: Optional[str] = Field(None, description="Optional output file path. If not provided, a temporary file will be used."),
+    return_base64: bool = Field(False, description="If true, return the image as a base64-encoded string. If false, return the file path."),
+    vertical: bool = Field(False, description="If true, generate vertical image (250x1024px). If false, generate horizontal image (1024x250px).")
+) -> str:
+    """Generate an image showing electricity grid availability for a given date.
+    
+    The image follows iOS design guidelines and can be generated in horizontal (1024x250px) 
+    or vertical (250x1024px) orientation.
+    
+    Input data should be a JSON object with T_Date (format: DD-MM-YYYY) and T_00 through T_23 
+    keys with values: '●' (available), '✕' (unavailable), '%' (partial/transition), or '-' (unknown).
+    """
+    return run_image_tool(grid_data, output_path, return_base64, vertical=vertical)
+
+
 @mcp.tool()
 def generate_grid_availability_image_vertical(
     grid_data: GridData,
@@ -107,34 +167,7 @@ def generate_grid_availability_image_vertical(
     Input data should be a JSON object with T_Date (format: DD-MM-YYYY) and T_00 through T_23 
     keys with values: '●' (available), '✕' (unavailable), '%' (partial/transition), or '-' (unknown).
     """
-    # Convert Pydantic model to dict
-    try:
-        grid_data_dict = grid_data.model_dump(exclude_none=True)
-    except AttributeError:
-        # Pydantic v1 fallback
-        grid_data_dict = grid_data.dict(exclude_none=True)
-    
-    # Validate required fields
-    if "T_Date" not in grid_data_dict:
-        raise ValueError("T_Date is required in grid_data")
-    
-    # Create temporary file if no output path provided
-    if output_path is None:
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp_file:
-            output_path = tmp_file.name
-    
-    # Generate the image (vertical)
-    generate_image(grid_data_dict, output_path, vertical=True)
-    
-    if return_base64:
-        # Read image and convert to base64
-        with open(output_path, "rb") as img_file:
-            image_data = img_file.read()
-            base64_data = base64.b64encode(image_data).decode("utf-8")
-        
-        return f"Grid availability image generated successfully. Image size: 250x1024px. Base64 data: {base64_data[:50]}..."
-    else:
-        return f"Grid availability image generated successfully at: {output_path}. Image size: 250x1024px"
+    return run_image_tool(grid_data, output_path, return_base64, vertical=True)
 
 
 if __name__ == "__main__":
@@ -144,6 +177,9 @@ if __name__ == "__main__":
     # Check for transport argument
     transport = os.getenv("TRANSPORT", "stdio")
     
+    # Build fonts and cached layouts before the first tool call
+    warm_caches()
+    
     if transport == "http" or "--http" in sys.argv:
         # Run with HTTP transport
         port = int(os.getenv("PORT", 8001))